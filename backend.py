@@ -3,9 +3,63 @@
 # Date: April 09, 2025
 # Description: Contains logic for sleep debt, circadian rhythm calculations, log analysis, and recommendations
 
-from datetime import datetime, timedelta
+from functools import lru_cache
 import numpy as np
-from scipy.interpolate import interp1d
+
+# Sleep-midpoint thresholds (hours) separating the chronotype labels
+_CHRONO_BINS = np.array([3.5, 5.0])
+_CHRONO_LABELS = np.array(["Early Bird", "Intermediate", "Night Owl"])
+
+def _chronotype(midpoint_hour):
+    """Classify sleep midpoint hour(s) as Early Bird, Intermediate, or Night Owl.
+
+    Args:
+        midpoint_hour (float or np.ndarray): Sleep midpoint in fractional hours.
+
+    Returns:
+        str or np.ndarray: Chronotype label(s).
+    """
+    labels = _CHRONO_LABELS[np.searchsorted(_CHRONO_BINS, midpoint_hour, side="right")]
+    return str(labels) if np.ndim(labels) == 0 else labels
+
+def _hm_to_hours(hm):
+    """Convert a zero-padded HH:MM string to fractional hours (e.g. "07:30" -> 7.5)."""
+    return int(hm[:2]) + int(hm[3:5]) / 60.0  # Slicing skips the list str.split would build
+
+def _fmt_hm(hours):
+    """Format fractional hours as HH:MM, wrapping past midnight and dropping seconds."""
+    total_minutes = int(hours * 60 + 1e-6) % (24 * 60)  # Epsilon guards against float error like 419.9999
+    return f"{total_minutes // 60:02d}:{total_minutes % 60:02d}"
+
+def _energy_knots(wake_hour, sleep_hour, energy):
+    """Build the sorted control points of the energy curve.
+
+    Args:
+        wake_hour (float): Wake time in fractional hours.
+        sleep_hour (float): Bedtime in fractional hours.
+        energy (int): Energy level (1-10).
+
+    Returns:
+        tuple: Sorted knot hours and the matching energy values.
+    """
+    key_hours = [0.0, wake_hour, (wake_hour + 3) % 24, (wake_hour + 7) % 24, (wake_hour + 11) % 24, sleep_hour % 24, 24.0]
+    # Base energy levels adjusted by user-reported energy
+    base_energy = [2, 2, 10, 3, 7, 2, 2]
+    adjusted_energy = [e * (energy / 10) for e in base_energy]  # Scale by reported energy
+    # Map each hour to its energy, keeping the first entry when hours collide
+    hour_to_energy = {}
+    for h, e in zip(key_hours, adjusted_energy):
+        hour_to_energy.setdefault(h, e)
+    unique_hours = sorted(hour_to_energy)
+    return unique_hours, [hour_to_energy[h] for h in unique_hours]
+
+# Canonical energy curve sampled once (wake at hour 0, energy 10, bedtime 16 hours later);
+# per-user curves are a shifted and scaled copy of it
+CANON_HOURS = np.linspace(0, 24, 100)
+CANON_ENERGY_TEMPLATE = np.interp(CANON_HOURS, *_energy_knots(0.0, 16.0, 10))
+CANON_HOURS.setflags(write=False)  # Shared by every rhythm result, so callers must not mutate it
+CANON_ENERGY_TEMPLATE.setflags(write=False)
+_GRID_STEP = CANON_HOURS[1] - CANON_HOURS[0]
 
 class SleepData:
     def __init__(self, sleep_time, wake_time, energy, stress, activity):
@@ -15,7 +69,14 @@ class SleepData:
         self.energy = energy          # Energy level (1-10)
         self.stress = stress          # Stress level (1-10)
         self.activity = activity      # Physical activity in minutes
+        # Derived values computed once so consumers never re-parse the time strings
+        self.sleep_h = _hm_to_hours(sleep_time)                   # Sleep start in fractional hours
+        self.wake_h = _hm_to_hours(wake_time)                     # Wake time in fractional hours
+        self.duration = (self.wake_h - self.sleep_h) % 24         # Hours slept, overnight-aware
+        self.midpoint_h = (self.sleep_h + self.duration / 2) % 24  # Sleep midpoint in fractional hours
+        self.debt = round(max(8 - self.duration, 0), 2)           # Sleep debt against an 8-hour target
 
+@lru_cache(maxsize=4096)
 def calculate_sleep_debt(sleep_time, wake_time):
     """Calculate sleep debt based on an 8-hour target.
 
@@ -26,11 +87,7 @@ def calculate_sleep_debt(sleep_time, wake_time):
     Returns:
         float: Sleep debt in hours (rounded to 2 decimals).
     """
-    sleep_dt = datetime.strptime(sleep_time, "%H:%M")
-    wake_dt = datetime.strptime(wake_time, "%H:%M")
-    if wake_dt < sleep_dt:
-        wake_dt += timedelta(days=1)  # Handle overnight sleep
-    duration = (wake_dt - sleep_dt).seconds / 3600
+    duration = (_hm_to_hours(wake_time) - _hm_to_hours(sleep_time)) % 24  # Handle overnight sleep
     return round(max(8 - duration, 0), 2)
 
 def calculate_circadian_rhythm(sleep_time, wake_time, energy):
@@ -42,45 +99,99 @@ def calculate_circadian_rhythm(sleep_time, wake_time, energy):
         energy (int): Energy level (1-10).
 
     Returns:
-        dict: Circadian rhythm details (midpoint, chronotype, key times, energy curve).
+        dict: Circadian rhythm details (midpoint as HH:MM and fractional hour, chronotype, key times,
+            graph marker table, energy curve).
     """
-    sleep_dt = datetime.strptime(sleep_time, "%H:%M")
-    wake_dt = datetime.strptime(wake_time, "%H:%M")
-    if wake_dt < sleep_dt:
-        wake_dt += timedelta(days=1)
-    duration = (wake_dt - sleep_dt).seconds / 3600
-    midpoint_dt = sleep_dt + timedelta(hours=duration / 2)
-    midpoint = midpoint_dt.strftime("%H:%M")
-    midpoint_hour = midpoint_dt.hour + midpoint_dt.minute / 60
-    # Determine chronotype based on sleep midpoint
-    chronotype = "Early Bird" if midpoint_hour < 3.5 else "Intermediate" if midpoint_hour < 5 else "Night Owl"
+    # Fresh dict per call so callers can't alter the cached result; the arrays are read-only
+    return dict(_circadian_rhythm_items(sleep_time, wake_time, energy))
 
-    # Calculate key circadian times
-    wake_hour = wake_dt.hour + wake_dt.minute / 60
-    sleep_hour = sleep_dt.hour + sleep_dt.minute / 60 if sleep_dt > wake_dt else sleep_dt.hour + sleep_dt.minute / 60 + 24
-    key_hours = [0.0, wake_hour, (wake_hour + 3) % 24, (wake_hour + 7) % 24, (wake_hour + 11) % 24, sleep_hour % 24, 24.0]
-    # Base energy levels adjusted by user-reported energy
-    base_energy = [2, 2, 10, 3, 7, 2, 2]
-    adjusted_energy = [e * (energy / 10) for e in base_energy]  # Scale by reported energy
+@lru_cache(maxsize=1024)
+def _circadian_rhythm_items(sleep_time, wake_time, energy):
+    """Compute circadian rhythm details once per (sleep_time, wake_time, energy).
+
+    Returns:
+        tuple: (key, value) pairs of the rhythm dict.
+    """
+    sleep_hour = _hm_to_hours(sleep_time)
+    wake_hour = _hm_to_hours(wake_time)
+    duration = (wake_hour - sleep_hour) % 24
+    midpoint_hour = (sleep_hour + duration / 2) % 24
+    midpoint = _fmt_hm(midpoint_hour)
+    # Determine chronotype based on sleep midpoint
+    chronotype = _chronotype(midpoint_hour)
 
-    # Interpolate energy curve for visualization
-    unique_hours = sorted(set(key_hours))
-    unique_energy = [adjusted_energy[key_hours.index(h)] for h in unique_hours if h in key_hours]
-    hours = np.linspace(0, 24, 100)
-    f = interp1d(unique_hours, unique_energy, kind="cubic", bounds_error=False, fill_value=2 * (energy / 10))
-    energy_curve = np.clip(f(hours), 0, 10)
+    # Shift the canonical curve so its wake point lands on the user's wake time, then scale by energy
+    shifted = np.roll(CANON_ENERGY_TEMPLATE, int(round(wake_hour / _GRID_STEP)))
+    energy_curve = np.clip(shifted * (energy / 10.0), 0, 10)
+    energy_curve.setflags(write=False)
 
-    return {
+    return tuple({
         "midpoint": midpoint,
+        "midpoint_hour": midpoint_hour,
         "chronotype": chronotype,
-        "wake_time": wake_dt.strftime("%H:%M"),
-        "morning_peak": (wake_dt + timedelta(hours=3)).strftime("%H:%M"),
-        "dip_time": (wake_dt + timedelta(hours=7)).strftime("%H:%M"),
-        "evening_peak": (wake_dt + timedelta(hours=11)).strftime("%H:%M"),
+        "wake_time": _fmt_hm(wake_hour),
+        "morning_peak": _fmt_hm(wake_hour + 3),
+        "dip_time": _fmt_hm(wake_hour + 7),
+        "evening_peak": _fmt_hm(wake_hour + 11),
         "bedtime": sleep_time,
-        "hours": hours,
+        # (hour, label, color, HH:MM) per graph marker, so plotting needs no string parsing
+        "marker_table": (
+            (wake_hour, "Wake", "green", _fmt_hm(wake_hour)),
+            ((wake_hour + 3) % 24, "Peak", "red", _fmt_hm(wake_hour + 3)),
+            ((wake_hour + 7) % 24, "Dip", "orange", _fmt_hm(wake_hour + 7)),
+            ((wake_hour + 11) % 24, "Evening", "purple", _fmt_hm(wake_hour + 11)),
+            (sleep_hour, "Bed", "blue", sleep_time)
+        ),
+        "hours": CANON_HOURS,
         "energy": energy_curve
-    }
+    }.items())
+
+def _parse_hm_array(times):
+    """Convert a sequence of HH:MM strings to fractional hours.
+
+    Args:
+        times (sequence): Times in HH:MM format.
+
+    Returns:
+        np.ndarray: Times as float hours (e.g. "07:30" -> 7.5).
+
+    Raises:
+        ValueError: If any time is not a zero-padded HH:MM between 00:00 and 23:59.
+    """
+    # Every time is exactly 5 ASCII bytes, so view them as an (N, 5) digit grid
+    if any(len(t) != 5 for t in times):  # Per entry: lengths like 4 + 6 would still total a multiple of 5
+        raise ValueError("Times must be in HH:MM format.")
+    encoded = "".join(times).encode("ascii")  # UnicodeEncodeError (a ValueError) for non-ASCII input
+    digits = np.frombuffer(encoded, dtype=np.uint8).reshape(-1, 5).astype(np.int16) - ord("0")
+    if (digits[:, 2] != ord(":") - ord("0")).any() or (digits[:, [0, 1, 3, 4]] > 9).any() or (digits < 0).any():
+        raise ValueError("Times must be in HH:MM format.")
+    hours = digits[:, 0] * 10 + digits[:, 1]
+    minutes = digits[:, 3] * 10 + digits[:, 4]
+    if (hours > 23).any() or (minutes > 59).any():
+        raise ValueError("Times must be valid 24-hour HH:MM values.")  # Same range as gui._HHMM
+    return hours + minutes / 60.0
+
+def _analyze(sleep_f, wake_f, energy):
+    """Average debt, midpoint, and energy over float-hour arrays in one pass.
+
+    Args:
+        sleep_f (np.ndarray): Sleep start times in fractional hours.
+        wake_f (np.ndarray): Wake times in fractional hours.
+        energy (np.ndarray): Energy levels (1-10).
+
+    Returns:
+        tuple: Average sleep debt, sleep midpoint hour, and energy level.
+    """
+    # In-place ufuncs keep large histories to three scratch arrays instead of one per step
+    duration = np.subtract(wake_f, sleep_f)
+    np.remainder(duration, 24, out=duration)  # Handle overnight sleep
+    debts = np.subtract(8, duration)
+    np.clip(debts, 0, None, out=debts)
+    np.round(debts, 2, out=debts)
+    midpoints = np.divide(duration, 2)
+    np.add(midpoints, sleep_f, out=midpoints)
+    np.remainder(midpoints, 24, out=midpoints)
+    return float(debts.mean()), float(midpoints.mean()), float(energy.mean())
 
 def analyze_sleep_logs(logs):
     """Analyze sleep logs to compute averages.
@@ -93,21 +204,39 @@ def analyze_sleep_logs(logs):
     """
     if not logs:
         return 0, "N/A", 0
-    total_debt = 0
-    midpoints = []
-    energy_levels = []
-    for sleep_time, wake_time, energy, _, _ in logs:
-        debt = calculate_sleep_debt(sleep_time, wake_time)
-        total_debt += debt
-        rhythm = calculate_circadian_rhythm(sleep_time, wake_time, energy)
-        midpoints.append(datetime.strptime(rhythm["midpoint"], "%H:%M").hour +
-                         datetime.strptime(rhythm["midpoint"], "%H:%M").minute / 60)
-        energy_levels.append(energy)
-    avg_debt = round(total_debt / len(logs), 2)
-    avg_midpoint = sum(midpoints) / len(midpoints)
-    avg_chronotype = "Early Bird" if avg_midpoint < 3.5 else "Intermediate" if avg_midpoint < 5 else "Night Owl"
-    avg_energy = round(sum(energy_levels) / len(energy_levels), 1)
-    return avg_debt, avg_chronotype, avg_energy
+    sleep_times, wake_times, energy_levels, _, _ = zip(*logs)
+    return analyze_sleep_arrays({"sleep_time": sleep_times, "wake_time": wake_times, "energy": energy_levels})
+
+def analyze_sleep_arrays(logs):
+    """Analyze sleep logs stored as one array per column.
+
+    Args:
+        logs (dict): Arrays keyed by sleep_time, wake_time, and energy
+            (as returned by database.get_user_sleep_logs_soa).
+
+    Returns:
+        tuple: Average sleep debt, chronotype, and energy level.
+    """
+    if len(logs["sleep_time"]) == 0:
+        return 0, "N/A", 0
+    avg_debt, avg_midpoint, avg_energy = _analyze(_parse_hm_array(logs["sleep_time"]), _parse_hm_array(logs["wake_time"]),
+                                                  np.asarray(logs["energy"], dtype=float))
+    return round(avg_debt, 2), _chronotype(avg_midpoint), round(avg_energy, 1)
+
+def analyze_sleep_summary(summary):
+    """Turn SQL-aggregated sleep log averages into report statistics.
+
+    Args:
+        summary (tuple): (log count, average sleep debt, average midpoint hour, average energy level),
+            as returned by database.get_user_summary.
+
+    Returns:
+        tuple: Average sleep debt, chronotype, and energy level, matching analyze_sleep_logs.
+    """
+    count, avg_debt, avg_midpoint, avg_energy = summary
+    if not count:
+        return 0, "N/A", 0
+    return round(avg_debt, 2), str(_chronotype(avg_midpoint)), round(avg_energy, 1)
 
 def generate_recommendations(sleep_debt, chronotype, sleep_quality, rhythm):
     """Generate personalized sleep recommendations.
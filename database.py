@@ -5,6 +5,17 @@
 
 import sqlite3
 import hashlib
+import hmac
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+DB_PATH = "neuronap.db"
+_CONN = None  # Shared connection, opened on first use
+_LOCK = threading.RLock()  # Serializes all use of the shared connection; re-entrant for transaction()
+PBKDF2_ITERATIONS = 200_000  # Work factor for password hashing
+_SHA256 = hashlib.sha256  # OpenSSL-backed constructor, bound once
 
 class User:
     def __init__(self, user_id, name, email, password, age):
@@ -15,17 +26,87 @@ class User:
         self.password = password    # Hashed password
         self.age = age              # User's age
 
+def get_connection():
+    """Return the shared SQLite connection, opening it on first use.
+
+    The connection runs in autocommit mode with WAL journaling so each call
+    reuses the open database instead of reconnecting.
+
+    Returns:
+        sqlite3.Connection: Connection shared by all database functions.
+    """
+    global _CONN
+    with _LOCK:
+        if _CONN is None:
+            _CONN = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+            _CONN.execute("PRAGMA journal_mode=WAL")
+            _CONN.execute("PRAGMA synchronous=NORMAL")
+    return _CONN
+
+def close_db():
+    """Close the shared connection, e.g. before removing the database file."""
+    global _CONN
+    with _LOCK:
+        if _CONN is not None:
+            _CONN.close()
+            _CONN = None
+
+@contextmanager
+def transaction():
+    """Run a group of database calls as one write transaction.
+
+    Takes the write lock and issues BEGIN IMMEDIATE, so every call inside the block
+    shares one commit (and one WAL sync) and reads inside it see its writes. Rolls back if
+    the block or the commit raises, so the connection is never left mid-transaction.
+
+    Yields:
+        sqlite3.Connection: The shared connection.
+    """
+    conn = get_connection()
+    with _LOCK:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:  # A failed COMMIT (e.g. SQLITE_BUSY) leaves it open
+                conn.execute("ROLLBACK")
+            raise
+
+def _fetch(sql, params, one=False):
+    """Run a read query under the connection lock.
+
+    Holding the lock keeps reads from other threads out of a transaction that is
+    still open, so they never see rows that may yet be rolled back.
+
+    Args:
+        sql (str): SELECT statement.
+        params (tuple): Query parameters.
+        one (bool): Return only the first row.
+
+    Returns:
+        list or tuple: All rows, or the first row (None if there is none) when one is True.
+    """
+    conn = get_connection()
+    with _LOCK:
+        cursor = conn.execute(sql, params)
+        return cursor.fetchone() if one else cursor.fetchall()
+
 def init_db():
     """Initialize the SQLite database with users and sleep_logs tables."""
-    conn = sqlite3.connect("neuronap.db")
+    conn = get_connection()
     c = conn.cursor()
     # Create users table
     c.execute('''CREATE TABLE IF NOT EXISTS users (
                  user_id INTEGER PRIMARY KEY AUTOINCREMENT,
                  name TEXT NOT NULL,
                  email TEXT UNIQUE NOT NULL,
-                 password TEXT NOT NULL,
-                 age INTEGER NOT NULL)''')
+                 password BLOB NOT NULL,
+                 age INTEGER NOT NULL,
+                 salt BLOB)''')
+    # Databases created before salted hashes need the salt column added
+    if "salt" not in [row[1] for row in c.execute("PRAGMA table_info(users)")]:
+        c.execute("ALTER TABLE users ADD COLUMN salt BLOB")
     # Create sleep_logs table with constraints
     c.execute('''CREATE TABLE IF NOT EXISTS sleep_logs (
                  log_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -36,8 +117,35 @@ def init_db():
                  stress_level INTEGER CHECK(stress_level >= 1 AND stress_level <= 10),
                  activity_level INTEGER CHECK(activity_level >= 0),
                  FOREIGN KEY (user_id) REFERENCES users(user_id))''')
-    conn.commit()
-    conn.close()
+    # Per-log duration and midpoint in hours, derived from the HH:MM columns so averages can run in SQL
+    c.execute('''CREATE VIEW IF NOT EXISTS sleep_log_hours AS
+                 SELECT user_id, energy_level,
+                        duration_min / 60.0 AS duration_hours,
+                        ((2 * sleep_min + duration_min) % 2880) / 120.0 AS midpoint_hour
+                 FROM (SELECT user_id, energy_level,
+                              CAST(substr(sleep_time, 1, 2) AS INTEGER) * 60 + CAST(substr(sleep_time, 4, 2) AS INTEGER) AS sleep_min,
+                              ((CAST(substr(wake_time, 1, 2) AS INTEGER) - CAST(substr(sleep_time, 1, 2) AS INTEGER)) * 60
+                               + CAST(substr(wake_time, 4, 2) AS INTEGER) - CAST(substr(sleep_time, 4, 2) AS INTEGER) + 1440) % 1440 AS duration_min
+                       FROM sleep_logs)''')
+    # Per-user index in log order that also carries the report and summary columns,
+    # so newest-first reads and the summary view never touch the table itself
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_sleep_logs_user_recent
+                 ON sleep_logs(user_id, log_id, sleep_time, wake_time, energy_level)''')
+    c.execute("DROP INDEX IF EXISTS idx_sleep_logs_user")  # Prefix of the index above
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)")
+    c.execute("PRAGMA optimize")  # Refresh planner statistics when they are stale
+
+def _hash_password(password, salt):
+    """Derive a password hash with PBKDF2-HMAC-SHA256.
+
+    Args:
+        password (str): Plain-text password.
+        salt (bytes): Per-user random salt.
+
+    Returns:
+        bytes: Raw 32-byte derived key.
+    """
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS)
 
 def register_user(name, email, password, age):
     """Register a new user with hashed password.
@@ -51,19 +159,16 @@ def register_user(name, email, password, age):
     Returns:
         int: User ID if successful, None if email is taken.
     """
-    conn = sqlite3.connect("neuronap.db")
-    c = conn.cursor()
-    hashed_pw = hashlib.sha256(password.encode()).hexdigest()
+    conn = get_connection()
+    salt = os.urandom(16)
+    hashed_pw = _hash_password(password, salt)
     try:
-        c.execute("INSERT INTO users (name, email, password, age) VALUES (?, ?, ?, ?)",
-                  (name, email, hashed_pw, age))
-        user_id = c.lastrowid
-        conn.commit()
-        return user_id
+        with _LOCK:
+            c = conn.execute("INSERT INTO users (name, email, password, age, salt) VALUES (?, ?, ?, ?, ?)",
+                             (name, email, hashed_pw, age, salt))
+        return c.lastrowid
     except sqlite3.IntegrityError:
         return None
-    finally:
-        conn.close()
 
 def login_user(email, password):
     """Authenticate a user and return user details.
@@ -75,14 +180,23 @@ def login_user(email, password):
     Returns:
         tuple: (user_id, name) if authenticated, None otherwise.
     """
-    conn = sqlite3.connect("neuronap.db")
-    c = conn.cursor()
-    hashed_pw = hashlib.sha256(password.encode()).hexdigest()
-    c.execute("SELECT user_id, name FROM users WHERE email = ? AND password = ?",
-              (email, hashed_pw))
-    result = c.fetchone()
-    conn.close()
-    return result if result else None
+    row = _fetch("SELECT user_id, name, password, salt FROM users WHERE email = ?", (email,), one=True)
+    if row is None:
+        return None
+    user_id, name, stored_pw, salt = row
+    if isinstance(stored_pw, str):
+        stored_pw = bytes.fromhex(stored_pw)  # Older rows stored hex text
+    if salt is None:
+        # Legacy account hashed with unsalted SHA-256; upgrade it on successful login
+        if not hmac.compare_digest(_SHA256(password.encode()).digest(), stored_pw):
+            return None
+        salt = os.urandom(16)
+        with _LOCK:
+            get_connection().execute("UPDATE users SET password = ?, salt = ? WHERE user_id = ?",
+                         (_hash_password(password, salt), salt, user_id))
+    elif not hmac.compare_digest(_hash_password(password, salt), stored_pw):
+        return None
+    return user_id, name
 
 def log_sleep(user_id, sleep_time, wake_time, energy_level, stress_level, activity_level):
     """Log a sleep entry for a user.
@@ -95,12 +209,20 @@ def log_sleep(user_id, sleep_time, wake_time, energy_level, stress_level, activi
         stress_level (int): Stress level (1-10).
         activity_level (int): Physical activity in minutes.
     """
-    conn = sqlite3.connect("neuronap.db")
-    c = conn.cursor()
-    c.execute("INSERT INTO sleep_logs (user_id, sleep_time, wake_time, energy_level, stress_level, activity_level) VALUES (?, ?, ?, ?, ?, ?)",
-              (user_id, sleep_time, wake_time, energy_level, stress_level, activity_level))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with _LOCK:
+        conn.execute("INSERT INTO sleep_logs (user_id, sleep_time, wake_time, energy_level, stress_level, activity_level) VALUES (?, ?, ?, ?, ?, ?)",
+                     (user_id, sleep_time, wake_time, energy_level, stress_level, activity_level))
+
+def log_sleep_bulk(rows):
+    """Log several sleep entries in a single transaction.
+
+    Args:
+        rows (list): List of tuples (user_id, sleep_time, wake_time, energy_level, stress_level, activity_level).
+    """
+    with transaction() as conn:
+        conn.executemany("INSERT INTO sleep_logs (user_id, sleep_time, wake_time, energy_level, stress_level, activity_level) VALUES (?, ?, ?, ?, ?, ?)",
+                         rows)
 
 def get_user_sleep_logs(user_id):
     """Retrieve all sleep logs for a user.
@@ -111,10 +233,63 @@ def get_user_sleep_logs(user_id):
     Returns:
         list: List of tuples (sleep_time, wake_time, energy_level, stress_level, activity_level).
     """
-    conn = sqlite3.connect("neuronap.db")
-    c = conn.cursor()
-    c.execute("SELECT sleep_time, wake_time, energy_level, stress_level, activity_level FROM sleep_logs WHERE user_id = ?",
-              (user_id,))
-    logs = c.fetchall()
-    conn.close()
-    return logs
\ No newline at end of file
+    return _fetch("SELECT sleep_time, wake_time, energy_level, stress_level, activity_level FROM sleep_logs WHERE user_id = ?",
+                  (user_id,))
+
+def get_recent_sleep_logs(user_id, limit=30):
+    """Retrieve a user's most recent sleep logs, newest first.
+
+    Args:
+        user_id (int): User's ID.
+        limit (int): Maximum number of logs to return.
+
+    Returns:
+        list: List of tuples (sleep_time, wake_time, energy_level, stress_level, activity_level).
+    """
+    return _fetch('''SELECT sleep_time, wake_time, energy_level, stress_level, activity_level
+                  FROM sleep_logs WHERE user_id = ? ORDER BY log_id DESC LIMIT ?''', (user_id, limit))
+
+def get_recent_log_entries(user_id, limit=3):
+    """Retrieve just the fields the report lists for a user's most recent logs, newest first.
+
+    Args:
+        user_id (int): User's ID.
+        limit (int): Maximum number of logs to return.
+
+    Returns:
+        list: List of tuples (sleep_time, wake_time, energy_level).
+    """
+    return _fetch('''SELECT sleep_time, wake_time, energy_level
+                  FROM sleep_logs WHERE user_id = ? ORDER BY log_id DESC LIMIT ?''', (user_id, limit))
+
+def get_user_summary(user_id):
+    """Aggregate a user's sleep logs inside SQLite.
+
+    Args:
+        user_id (int): User's ID.
+
+    Returns:
+        tuple: (log count, average sleep debt, average midpoint hour, average energy level);
+            the averages are None when the user has no logs.
+    """
+    return _fetch('''SELECT COUNT(*), AVG(ROUND(MAX(8 - duration_hours, 0), 2)),
+                         AVG(midpoint_hour), AVG(energy_level)
+                  FROM sleep_log_hours WHERE user_id = ?''', (user_id,), one=True)
+
+def get_user_sleep_logs_soa(user_id):
+    """Retrieve all sleep logs for a user as one array per column.
+
+    Args:
+        user_id (int): User's ID.
+
+    Returns:
+        dict: Arrays keyed by sleep_time, wake_time, energy, stress, and activity.
+    """
+    columns = list(zip(*get_user_sleep_logs(user_id))) or [()] * 5
+    return {
+        "sleep_time": np.array(columns[0], dtype=str),
+        "wake_time": np.array(columns[1], dtype=str),
+        "energy": np.array(columns[2], dtype=np.int8),
+        "stress": np.array(columns[3], dtype=np.int8),
+        "activity": np.array(columns[4], dtype=np.int32)
+    }
@@ -5,16 +5,112 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas as pdfcanvas
-import os
-from datetime import datetime
+import asyncio
+from dataclasses import dataclass
+import io
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import backend
 import database
 import ml
 
+_HHMM = re.compile(r"^([01]\d|2[0-3]):([0-5]\d)$")  # Valid 24-hour HH:MM time
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_-]+")  # Runs of characters kept out of report file names
+TIMES = tuple(f"{h:02d}:{m:02d}" for h in range(24) for m in (0, 15, 30, 45))  # Dropdown options (15-minute intervals)
+_TICK_LABELS = tuple(str(i) for i in range(1, 11))  # Slider tick labels 1-10
+
+_LOG_LINE = "Log {}: Sleep {} - Wake {}, Energy {}".format  # Bound once; reused for every past log
+_PDF_FIGURE = None  # (figure, axes, artists) for PDF graphs, built by _pdf_rhythm_figure
+_PDF_LAST_PNG = None  # (title, rhythm key, PNG bytes) of the last PDF graph, reused for repeat saves
+_PDF_FIGURE_LOCK = threading.Lock()
+
+# Static report sections shown under every report's suggestions
+BENEFITS_TEXT = """✅ Benefits of Following Circadian Rhythm
+1. Improved Sleep Quality
+   • Fall asleep faster and wake up refreshed.
+   • Better REM and deep sleep phases.
+2. Higher Energy & Focus
+   • Peak alertness during the day.
+   • Reduced brain fog and midday slumps.
+3. Balanced Hormones
+   • Optimized cortisol, melatonin, and testosterone cycles.
+   • Supports muscle growth, libido, and mental stability.
+4. Enhanced Metabolism & Weight Loss
+   • Better insulin sensitivity and digestion.
+   • Aligns eating with natural digestive efficiency.
+5. Better Mental Health
+   • Reduced risk of depression and anxiety.
+   • Stable mood regulation.
+6. Stronger Immune Function
+   • Reduced inflammation.
+   • Optimized cellular repair during sleep.
+
+"""
+
+TECHNIQUES_TEXT = """🧠 Techniques to Align with Circadian Rhythm
+🌞 Morning (6 AM – 10 AM)
+   • Wake up at the same time daily, preferably at sunrise.
+   • Get sunlight exposure within 30 minutes of waking (20+ minutes outdoors).
+   • Avoid screens for the first 30 minutes.
+   • Hydrate and eat a high-protein breakfast to jumpstart metabolism.
+🕑 Daytime (10 AM – 6 PM)
+   • Do focused mental tasks and workouts in the first half of the day (peak alertness).
+   • Eat largest meal around midday, aligning with peak digestion.
+   • Avoid caffeine after 2 PM.
+🌇 Evening (6 PM – 10 PM)
+   • Dim lights after sunset (use warm or red lights).
+   • Limit screen use or use blue light blockers.
+   • Eat a light dinner, ideally 2-3 hours before bedtime.
+   • Start winding down rituals (reading, journaling, stretching).
+🌙 Night (10 PM – 6 AM)
+   • Sleep between 10 PM – 6 AM for best recovery.
+   • Maintain a cool, dark, quiet bedroom.
+   • Avoid eating, exercising, or stressing late at night.
+   • Consistent sleep and wake time is key—even on weekends.
+🔁 Optional Add-ons
+   • Circadian Fasting (Time-Restricted Eating): Eat only between 8 AM and 6 PM.
+   • Sun-mimicking lamps if living in low-sunlight areas.
+"""
+
+# FAQ lines for the last page of the PDF report
+_FAQ_LINES: tuple[str, ...] = (
+    "Sleep and Immune Function: Sleep boosts immunity. Missing 7 hours weekly ups cold risk!",
+    "Sleep Need & Debt: Most need 7-9 hours. Debt accumulates over 2 weeks—keep under 5 hours.",
+    "Circadian Rhythm: Energy peaks morning/evening, dips midday, tied to sleep habits.",
+    "Alcohol and Sleep: May aid sleep onset but disrupts deep sleep. Avoid 3-4 hours pre-bed.",
+    "Naps: 15-25 min naps during dips recharge without affecting night sleep.",
+    "Sleep Schedule Tips: Morning light, no caffeine 10 hours before bed, cozy sleep space.",
+)
+
+def _configure_styles(root):
+    """Configure the shared ttk styles once per Tk root.
+
+    Args:
+        root (tk.Tk): Root window whose Tcl interpreter owns the styles.
+
+    Returns:
+        ttk.Style: The configured style object.
+    """
+    style = ttk.Style(root)
+    if getattr(root, "_neuronap_styled", False):
+        return style  # Already configured for this interpreter
+    style.configure("TButton", font=("Arial", 12), foreground="black", padding=5)
+    style.configure("TLabel", font=("Arial", 12), background="#F5F6F5")
+    style.configure("TCombobox", font=("Arial", 12))
+    style.configure("TEntry", font=("Arial", 12))
+    root._neuronap_styled = True
+    return style
+
+@dataclass(slots=True)
+class LastInputs:
+    """Most recently used sleep log inputs, used by Quick Fill (defaults for a new user)."""
+    sleep_time: str = "23:00"
+    wake_time: str = "07:00"
+    energy: int = 7
+    stress: int = 5
+    activity: int = 60
+
 class NeuroNapApp:
     def __init__(self, root):
         """Initialize the GUI application with Tkinter root window."""
@@ -24,8 +120,15 @@ class NeuroNapApp:
         self.root.configure(bg="#F5F6F5")  # Light background color
         self.user_id = None  # Current user ID
         self.user_name = None  # Current user name
-        self.ml_model, self.ml_scaler = ml.train_model()  # Load ML model and scaler
-        self.tooltip = None  # Tooltip for hover help
+        self._user_slug = None  # File-name-safe form of user_name, set at login/register
+        self.ml_model = self.ml_scaler = None  # Filled in by the background model loader
+        self.ml_ready = threading.Event()  # Set once the model load has finished, successfully or not
+        self._model_error = None  # Message from a failed model load, shown by poll_model_ready
+        self.tooltip = tk.Label(self.root, bg="lightyellow", relief="solid", borderwidth=1, font=("Arial", 10))  # Shared hover help
+        self._tick_image = None  # Slider tick marks, rasterized once by add_tick_strip
+        self._tooltips = {}  # Widget path -> tooltip text, looked up by the class-level hover bindings
+        self._pool = ThreadPoolExecutor(max_workers=2)  # Log analysis and PDF writing run here, off the Tk thread
+        self.loop = asyncio.new_event_loop()  # Driven from the Tk loop by _pump; coroutines resume on the Tk thread
 
         database.init_db()  # Initialize SQLite database
 
@@ -37,20 +140,114 @@ class NeuroNapApp:
         self.auth_frame = ttk.Frame(self.main_frame, padding=20)
         self.log_frame = ttk.Frame(self.main_frame, padding=20)
         self.result_frame = ttk.Frame(self.main_frame, padding=20)
+        # Non-modal status line under the current frame for transient success/error messages
+        self.status_label = ttk.Label(self.main_frame, anchor="center")
+        self.status_label.grid(row=1, column=0, pady=5)
+        self._status_clear_id = None  # Pending after() id that clears the status line
 
         # Configure styles for consistent look
-        self.style = ttk.Style()
-        self.style.configure("TButton", font=("Arial", 12), foreground="black", padding=5)
-        self.style.configure("TLabel", font=("Arial", 12), background="#F5F6F5")
-        self.style.configure("TCombobox", font=("Arial", 12))
-        self.style.configure("TEntry", font=("Arial", 12))
-
-        # Time options for dropdowns (15-minute intervals)
-        self.times = [f"{h:02d}:{m:02d}" for h in range(24) for m in [0, 15, 30, 45]]
+        self.style = _configure_styles(self.root)
+
         # Store last used inputs for Quick Fill
-        self.last_inputs = {"sleep_time": "23:00", "wake_time": "07:00", "energy": 7, "stress": 5, "activity": 60}
+        self.last_inputs = LastInputs()
+        self.report_args = None  # (report text, suggestions text, rhythm) of the report on screen
+
+        # Build every screen's widgets once; show_* methods only refresh their contents
+        self._build_auth()
+        self._build_log()
+        self._build_result()
+        # One pair of hover handlers per widget class instead of a pair of closures per widget
+        for widget_class in ("TEntry", "TCombobox", "TScale"):
+            self.root.bind_class(widget_class, "<Enter>", self.on_hover, add="+")
+            self.root.bind_class(widget_class, "<Leave>", self.hide_tooltip, add="+")
 
         self.show_auth_frame()  # Start with authentication screen
+        self._pump()  # Start running asyncio callbacks alongside Tk events
+        # Load (or train) the ML model without blocking the first paint
+        threading.Thread(target=self.load_model, daemon=True).start()
+        self.root.after(100, self.poll_model_ready)
+
+    def _pump(self):
+        """Run the asyncio callbacks that are ready, then reschedule from the Tk loop.
+
+        Polls every 10 ms while tasks are pending and every 100 ms when idle.
+        """
+        if not self.loop.is_running():  # A modal dialog opened from a task re-enters Tk; don't nest the loop
+            self.loop.call_soon(self.loop.stop)
+            self.loop.run_forever()
+        self.root.after(10 if asyncio.all_tasks(self.loop) else 100, self._pump)
+
+    def load_model(self):
+        """Load the cached ML model, training it if needed (runs off the Tk thread).
+
+        On failure the app keeps ml_model as None, so predictions use the default quality.
+        """
+        try:
+            self.ml_model, self.ml_scaler = ml.load_model()
+        except Exception as e:
+            self._model_error = f"Sleep quality model unavailable ({e}); using default predictions."
+        finally:
+            self.ml_ready.set()  # Always release Submit, even if loading failed
+
+    def poll_model_ready(self):
+        """Enable the Submit button once the background model load finishes, reporting any failure."""
+        if not self.ml_ready.is_set():
+            self.root.after(100, self.poll_model_ready)
+        else:
+            self.submit_btn.state(["!disabled"])
+            if self._model_error:
+                self._flash(self._model_error, "red")  # Tk calls stay on the Tk thread
+
+    def ensure_rhythm_plot(self):
+        """Create the rhythm graph on first use, so matplotlib is only imported once a report is shown."""
+        if self.rhythm_canvas is not None:
+            return
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        # Built once and updated in place for each report
+        self.rhythm_fig = Figure(figsize=(4, 4))  # Reduced size for symmetry; no pyplot figure manager
+        self.rhythm_ax = self.rhythm_fig.add_subplot(111)
+        self.rhythm_canvas = FigureCanvasTkAgg(self.rhythm_fig, master=self.result_frame)
+        self.rhythm_canvas.get_tk_widget().grid(row=1, column=1, padx=20, pady=20, sticky="nsew")
+        self.rhythm_background = None  # Static axes/grid/labels, cached after each full draw
+        self._shown_rhythm_key = None  # rhythm_key of the data currently drawn
+        self.build_rhythm_plot()
+
+    def build_rhythm_plot(self):
+        """Create the static axes and the animated curve/marker artists of the rhythm graph."""
+        _setup_rhythm_axes(self.rhythm_ax)
+        # Animated artists are skipped by full draws and blitted over the cached background
+        self.rhythm_line, self.rhythm_marker_lines, self.rhythm_marker_texts = _add_rhythm_artists(self.rhythm_ax, animated=True)
+        self.rhythm_canvas.mpl_connect("draw_event", self.on_rhythm_draw)
+
+    def rhythm_artists(self):
+        """Return the animated artists of the rhythm graph."""
+        return [self.rhythm_line, self.rhythm_marker_lines] + self.rhythm_marker_texts
+
+    def on_rhythm_draw(self, event):
+        """Cache the freshly drawn background and paint the animated artists over it."""
+        self.rhythm_background = self.rhythm_canvas.copy_from_bbox(self.rhythm_fig.bbox)
+        for artist in self.rhythm_artists():
+            self.rhythm_ax.draw_artist(artist)
+
+    def update_rhythm_plot(self, rhythm):
+        """Update the rhythm graph in place, blitting when only the data changed."""
+        title = f"{self.user_name}'s Circadian Rhythm"
+        key = rhythm_key(rhythm)
+        if key == self._shown_rhythm_key and self.rhythm_ax.get_title() == title:
+            return  # Same graph as on screen, e.g. the same times submitted again
+        self._shown_rhythm_key = key
+        _set_rhythm_data(self.rhythm_line, self.rhythm_marker_lines, self.rhythm_marker_texts, rhythm)
+        if self.rhythm_ax.get_title() != title:
+            self.rhythm_ax.set_title(title, fontsize=12, pad=10)
+            self.rhythm_background = None  # Static content changed; needs a full redraw
+        if self.rhythm_background is None:
+            self.rhythm_canvas.draw_idle()
+        else:
+            self.rhythm_canvas.restore_region(self.rhythm_background)
+            for artist in self.rhythm_artists():
+                self.rhythm_ax.draw_artist(artist)
+            self.rhythm_canvas.blit(self.rhythm_fig.bbox)
 
     def center_frame(self, frame):
         """Center a frame within the main window."""
@@ -63,25 +260,44 @@ class NeuroNapApp:
         for frame in [self.auth_frame, self.log_frame, self.result_frame]:
             frame.grid_forget()
 
+    def _flash(self, message, color="green"):
+        """Show a transient message in the status line, clearing it after 3 seconds.
+
+        Used instead of a messagebox for routine feedback, so no nested modal event loop runs.
+        """
+        self.status_label.config(text=message, foreground=color)
+        if self._status_clear_id is not None:
+            self.root.after_cancel(self._status_clear_id)
+        self._status_clear_id = self.root.after(3000, self._clear_status)
+
+    def _clear_status(self):
+        """Clear the status line."""
+        self.status_label.config(text="")
+        self._status_clear_id = None
+
+    def set_tooltip(self, widget, text):
+        """Register the hover help text for a widget."""
+        self._tooltips[str(widget)] = text
+
+    def on_hover(self, event):
+        """Show the registered tooltip, if any, for the widget under the pointer."""
+        text = self._tooltips.get(str(event.widget))
+        if text:
+            self.show_tooltip(event.widget, text)
+
     def show_tooltip(self, widget, text, x_offset=10, y_offset=10):
         """Show a tooltip on hover with given text."""
-        if self.tooltip:
-            self.tooltip.destroy()
-        self.tooltip = tk.Label(self.root, text=text, bg="lightyellow", relief="solid", borderwidth=1, font=("Arial", 10))
+        self.tooltip.config(text=text)
         x, y = widget.winfo_rootx() + x_offset, widget.winfo_rooty() + y_offset
         self.tooltip.place(x=x, y=y)
+        self.tooltip.lift()
 
-    def hide_tooltip(self):
+    def hide_tooltip(self, event=None):
         """Hide the tooltip."""
-        if self.tooltip:
-            self.tooltip.destroy()
-            self.tooltip = None
-
-    def show_auth_frame(self):
-        """Display login/registration screen."""
-        self.clear_frames()
-        self.center_frame(self.auth_frame)
+        self.tooltip.place_forget()
 
+    def _build_auth(self):
+        """Create the login/registration widgets (called once)."""
         # Title label
         ttk.Label(self.auth_frame, text="Welcome to NeuroNap", font=("Arial", 16, "bold")).grid(row=0, column=0, columnspan=2, pady=10)
 
@@ -89,118 +305,127 @@ class NeuroNapApp:
         ttk.Label(self.auth_frame, text="Name:").grid(row=1, column=0, padx=5, pady=5)
         self.name_entry = ttk.Entry(self.auth_frame)
         self.name_entry.grid(row=1, column=1, padx=5, pady=5)
-        self.name_entry.bind("<Enter>", lambda e: self.show_tooltip(self.name_entry, "Enter your full name"))
-        self.name_entry.bind("<Leave>", lambda e: self.hide_tooltip())
+        self.set_tooltip(self.name_entry, "Enter your full name")
 
         # Email input
         ttk.Label(self.auth_frame, text="Email:").grid(row=2, column=0, padx=5, pady=5)
         self.email_entry = ttk.Entry(self.auth_frame)
         self.email_entry.grid(row=2, column=1, padx=5, pady=5)
-        self.email_entry.bind("<Enter>", lambda e: self.show_tooltip(self.email_entry, "Enter your email"))
-        self.email_entry.bind("<Leave>", lambda e: self.hide_tooltip())
+        self.set_tooltip(self.email_entry, "Enter your email")
 
         # Password input
         ttk.Label(self.auth_frame, text="Password:").grid(row=3, column=0, padx=5, pady=5)
         self.pass_entry = ttk.Entry(self.auth_frame, show="*")
         self.pass_entry.grid(row=3, column=1, padx=5, pady=5)
-        self.pass_entry.bind("<Enter>", lambda e: self.show_tooltip(self.pass_entry, "Enter your password"))
-        self.pass_entry.bind("<Leave>", lambda e: self.hide_tooltip())
+        self.set_tooltip(self.pass_entry, "Enter your password")
 
         # Age input for new users
         ttk.Label(self.auth_frame, text="Age (new users):").grid(row=4, column=0, padx=5, pady=5)
         self.age_entry = ttk.Entry(self.auth_frame)
         self.age_entry.grid(row=4, column=1, padx=5, pady=5)
-        self.age_entry.bind("<Enter>", lambda e: self.show_tooltip(self.age_entry, "Enter your age (numbers only)"))
-        self.age_entry.bind("<Leave>", lambda e: self.hide_tooltip())
+        self.set_tooltip(self.age_entry, "Enter your age (numbers only)")
 
         # Login and Register buttons
         ttk.Button(self.auth_frame, text="Login", command=self.login).grid(row=5, column=0, pady=10)
         ttk.Button(self.auth_frame, text="Register", command=self.register).grid(row=5, column=1, pady=10)
 
-    def show_log_frame(self):
-        """Display sleep log entry screen with dropdowns and sliders."""
+    def show_auth_frame(self):
+        """Display login/registration screen."""
         self.clear_frames()
-        self.center_frame(self.log_frame)
+        self.center_frame(self.auth_frame)
+        for entry in (self.name_entry, self.email_entry, self.pass_entry, self.age_entry):
+            entry.delete(0, tk.END)  # Start from empty fields, e.g. after "Back"
 
-        # Title with user name
-        ttk.Label(self.log_frame, text=f"Log Sleep for {self.user_name}", font=("Arial", 16, "bold")).grid(row=0, column=0, columnspan=2, pady=10)
+    def _build_log(self):
+        """Create the sleep log entry widgets (called once)."""
+        # Title with user name, filled in by show_log_frame
+        self.log_title = ttk.Label(self.log_frame, font=("Arial", 16, "bold"))
+        self.log_title.grid(row=0, column=0, columnspan=2, pady=10)
 
         # Sleep time dropdown
         ttk.Label(self.log_frame, text="Sleep Time:").grid(row=1, column=0, padx=5, pady=5)
-        self.sleep_combo = ttk.Combobox(self.log_frame, values=self.times, state="readonly")
-        self.sleep_combo.set(self.last_inputs["sleep_time"])
+        self.sleep_combo = ttk.Combobox(self.log_frame, values=TIMES, state="readonly")
         self.sleep_combo.grid(row=1, column=1, padx=5, pady=5)
-        self.sleep_combo.bind("<Enter>", lambda e: self.show_tooltip(self.sleep_combo, "Select sleep start time"))
-        self.sleep_combo.bind("<Leave>", lambda e: self.hide_tooltip())
+        self.set_tooltip(self.sleep_combo, "Select sleep start time")
 
         # Wake time dropdown
         ttk.Label(self.log_frame, text="Wake Time:").grid(row=2, column=0, padx=5, pady=5)
-        self.wake_combo = ttk.Combobox(self.log_frame, values=self.times, state="readonly")
-        self.wake_combo.set(self.last_inputs["wake_time"])
+        self.wake_combo = ttk.Combobox(self.log_frame, values=TIMES, state="readonly")
         self.wake_combo.grid(row=2, column=1, padx=5, pady=5)
-        self.wake_combo.bind("<Enter>", lambda e: self.show_tooltip(self.wake_combo, "Select wake time"))
-        self.wake_combo.bind("<Leave>", lambda e: self.hide_tooltip())
+        self.set_tooltip(self.wake_combo, "Select wake time")
 
         # Energy level slider
         ttk.Label(self.log_frame, text="Energy Level (1-10):").grid(row=3, column=0, padx=5, pady=5)
         energy_frame = ttk.Frame(self.log_frame)
         energy_frame.grid(row=3, column=1, padx=5, pady=5)
-        self.energy_var = tk.IntVar(value=self.last_inputs["energy"])
-        self.energy_slider = ttk.Scale(energy_frame, from_=1, to=10, orient="horizontal", variable=self.energy_var,
-                                      command=lambda x: self.energy_var.set(int(float(x) + 0.5)))
+        self.energy_var = tk.IntVar()
+        self.energy_slider = ttk.Scale(energy_frame, from_=1, to=10, orient="horizontal", variable=self.energy_var)
+        self.energy_slider.bind("<ButtonRelease-1>", snap_slider)  # Round once per drag, not per motion event
         self.energy_slider.grid(row=0, column=0)
-        # Add tick marks for 1-10
-        canvas = tk.Canvas(energy_frame, width=150, height=20, bg="#F5F6F5", highlightthickness=0)
-        canvas.grid(row=1, column=0)
-        for i in range(1, 11):
-            x = (i - 1) * 15
-            canvas.create_line(x, 0, x, 10, fill="black")
-            canvas.create_text(x, 15, text=str(i), font=("Arial", 8))
-        self.energy_slider.bind("<Enter>", lambda e: self.show_tooltip(self.energy_slider, "Slide to set energy level"))
-        self.energy_slider.bind("<Leave>", lambda e: self.hide_tooltip())
+        self.add_tick_strip(energy_frame)  # Tick marks for 1-10
+        self.set_tooltip(self.energy_slider, "Slide to set energy level")
 
         # Stress level slider
         ttk.Label(self.log_frame, text="Stress Level (1-10):").grid(row=4, column=0, padx=5, pady=5)
         stress_frame = ttk.Frame(self.log_frame)
         stress_frame.grid(row=4, column=1, padx=5, pady=5)
-        self.stress_var = tk.IntVar(value=self.last_inputs["stress"])
-        self.stress_slider = ttk.Scale(stress_frame, from_=1, to=10, orient="horizontal", variable=self.stress_var,
-                                      command=lambda x: self.stress_var.set(int(float(x) + 0.5)))
+        self.stress_var = tk.IntVar()
+        self.stress_slider = ttk.Scale(stress_frame, from_=1, to=10, orient="horizontal", variable=self.stress_var)
+        self.stress_slider.bind("<ButtonRelease-1>", snap_slider)  # Round once per drag, not per motion event
         self.stress_slider.grid(row=0, column=0)
-        # Add tick marks for 1-10
-        canvas = tk.Canvas(stress_frame, width=150, height=20, bg="#F5F6F5", highlightthickness=0)
-        canvas.grid(row=1, column=0)
-        for i in range(1, 11):
-            x = (i - 1) * 15
-            canvas.create_line(x, 0, x, 10, fill="black")
-            canvas.create_text(x, 15, text=str(i), font=("Arial", 8))
-        self.stress_slider.bind("<Enter>", lambda e: self.show_tooltip(self.stress_slider, "Slide to set stress level"))
-        self.stress_slider.bind("<Leave>", lambda e: self.hide_tooltip())
+        self.add_tick_strip(stress_frame)  # Tick marks for 1-10
+        self.set_tooltip(self.stress_slider, "Slide to set stress level")
 
         # Activity level input
         ttk.Label(self.log_frame, text="Activity Level (min):").grid(row=5, column=0, padx=5, pady=5)
-        self.activity_entry = ttk.Entry(self.log_frame)
-        self.activity_entry.insert(0, str(self.last_inputs["activity"]))
+        # Reject anything but digits as it is typed, so log_sleep always gets a non-negative integer
+        vcmd = (self.root.register(lambda proposed: proposed == "" or proposed.isdecimal()), "%P")
+        self.activity_entry = ttk.Entry(self.log_frame, validate="key", validatecommand=vcmd)
         self.activity_entry.grid(row=5, column=1, padx=5, pady=5)
-        self.activity_entry.bind("<Enter>", lambda e: self.show_tooltip(self.activity_entry, "Enter minutes of physical activity"))
-        self.activity_entry.bind("<Leave>", lambda e: self.hide_tooltip())
-        self.activity_entry.bind("<FocusIn>", lambda e: self.activity_entry.delete(0, tk.END) if self.activity_entry.get() == str(self.last_inputs["activity"]) else None)
+        self.set_tooltip(self.activity_entry, "Enter minutes of physical activity")
+        self.activity_entry.bind("<FocusIn>", lambda e: self.activity_entry.delete(0, tk.END) if self.activity_entry.get() == str(self.last_inputs.activity) else None)
 
         # Buttons: Submit, Clear, Quick Fill
         button_frame = ttk.Frame(self.log_frame)
         button_frame.grid(row=6, column=0, columnspan=2, pady=10)
-        ttk.Button(button_frame, text="Submit", command=self.log_sleep).grid(row=0, column=0, padx=5)
+        self.submit_btn = ttk.Button(button_frame, text="Submit", command=self.log_sleep)
+        self.submit_btn.grid(row=0, column=0, padx=5)
         ttk.Button(button_frame, text="Clear", command=self.clear_log).grid(row=0, column=1, padx=5)
         ttk.Button(button_frame, text="Quick Fill", command=self.quick_fill).grid(row=0, column=2, padx=5)
         ttk.Button(self.log_frame, text="Back", command=self.show_auth_frame).grid(row=7, column=0, columnspan=2, pady=5)
 
+    def add_tick_strip(self, parent):
+        """Place the 1-10 tick marks and labels under a slider.
+
+        The ten tick lines are rasterized once into a PhotoImage shared by every strip,
+        so each strip is one image item plus its labels.
+        """
+        if self._tick_image is None:
+            self._tick_image = tk.PhotoImage(width=150, height=11)
+            for i in range(len(_TICK_LABELS)):
+                self._tick_image.put("black", to=(i * 15, 0, i * 15 + 1, 11))
+        canvas = tk.Canvas(parent, width=150, height=20, bg="#F5F6F5", highlightthickness=0)
+        canvas.grid(row=1, column=0)
+        canvas.create_image(0, 0, image=self._tick_image, anchor="nw")
+        for i, label in enumerate(_TICK_LABELS):
+            canvas.create_text(i * 15, 15, text=label, font=("Arial", 8))
+
+    def show_log_frame(self):
+        """Display sleep log entry screen with dropdowns and sliders."""
+        self.clear_frames()
+        self.center_frame(self.log_frame)
+        self.log_title.config(text=f"Log Sleep for {self.user_name}")
+        self.quick_fill()  # Start from the last used inputs
+        if not self.ml_ready.is_set():
+            self.submit_btn.state(["disabled"])  # Re-enabled by poll_model_ready
+
         # Bind Enter key to submit
         self.log_frame.bind_all("<Return>", lambda e: self.log_sleep())
 
     def clear_log(self):
         """Clear all input fields in the sleep log screen."""
-        self.sleep_combo.set(self.times[0])  # Reset to first time
-        self.wake_combo.set(self.times[0])   # Reset to first time
+        self.sleep_combo.set(TIMES[0])  # Reset to first time
+        self.wake_combo.set(TIMES[0])   # Reset to first time
         self.energy_var.set(1)               # Reset slider
         self.stress_var.set(1)               # Reset slider
         self.activity_entry.delete(0, tk.END)
@@ -208,114 +433,78 @@ class NeuroNapApp:
 
     def quick_fill(self):
         """Fill fields with last used or default values."""
-        self.sleep_combo.set(self.last_inputs["sleep_time"])
-        self.wake_combo.set(self.last_inputs["wake_time"])
-        self.energy_var.set(self.last_inputs["energy"])
-        self.stress_var.set(self.last_inputs["stress"])
+        self.sleep_combo.set(self.last_inputs.sleep_time)
+        self.wake_combo.set(self.last_inputs.wake_time)
+        self.energy_var.set(self.last_inputs.energy)
+        self.stress_var.set(self.last_inputs.stress)
         self.activity_entry.delete(0, tk.END)
-        self.activity_entry.insert(0, str(self.last_inputs["activity"]))
+        self.activity_entry.insert(0, str(self.last_inputs.activity))
 
-    def show_result_frame(self, sleep_debt, rhythm, sleep_quality, tips, avg_debt, avg_chronotype, avg_energy, logs):
-        """Display sleep report with symmetrical layout and enhanced insights."""
-        self.clear_frames()
-        self.center_frame(self.result_frame)
-
-        # Title centered at the top
-        title_label = ttk.Label(self.result_frame, text=f"{self.user_name}'s Sleeping Report", font=("Arial", 16, "bold"))
-        title_label.grid(row=0, column=0, columnspan=2, pady=10)
+    def _build_result(self):
+        """Create the sleep report widgets (called once); the graph waits for the first report."""
+        # Title centered at the top, filled in by show_result_frame
+        self.result_title = ttk.Label(self.result_frame, font=("Arial", 16, "bold"))
+        self.result_title.grid(row=0, column=0, columnspan=2, pady=10)
 
         # Two-column layout for symmetry
         left_column = ttk.Frame(self.result_frame)
-        right_column = ttk.Frame(self.result_frame)
         left_column.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
-        right_column.grid(row=1, column=1, padx=10, pady=10, sticky="nsew")
         self.result_frame.grid_columnconfigure(0, weight=1)
         self.result_frame.grid_columnconfigure(1, weight=1)
 
-        # Left column: Report text
-        report_text = f"Latest Sleep Log:\nSleep Debt: {sleep_debt} hours\nMidpoint: {rhythm['midpoint']}\nChronotype: {rhythm['chronotype']}\nSleep Quality: {sleep_quality}/10\n\n"
-        report_text += f"Average Over {len(logs)} Logs:\nAvg Sleep Debt: {avg_debt} hours\nAvg Chronotype: {avg_chronotype}\nAvg Energy: {avg_energy}/10\n\n"
-        report_text += "Past Logs:\n" + "\n".join([f"Log {i+1}: Sleep {s} - Wake {w}, Energy {e}" for i, (s, w, e, _, _) in enumerate(logs[:3])]) + "\n\n"
-        suggestions_text = "Suggestions:\n" + "\n".join(tips[:5]) + "\n\n"
+        # Left column: Report text, rewritten for each report
+        # Read-only, so no undo stack; the static benefits/techniques sections are inserted once and
+        # the "report_end" mark (right gravity) tracks where the per-report head stops
+        self.report_display = tk.Text(left_column, height=30, width=50, font=("Arial", 10), wrap="word",
+                                      undo=False, autoseparators=False, maxundo=0)
+        self.report_display.pack(expand=True, fill="both", padx=10, pady=10)
+        self.report_display.insert("1.0", BENEFITS_TEXT + TECHNIQUES_TEXT)
+        self.report_display.mark_set("report_end", "1.0")
+        self.report_display.config(state="disabled")
 
-        # Add benefits and techniques
-        benefits_text = "✅ Benefits of Following Circadian Rhythm\n" \
-                       "1. Improved Sleep Quality\n" \
-                       "   • Fall asleep faster and wake up refreshed.\n" \
-                       "   • Better REM and deep sleep phases.\n" \
-                       "2. Higher Energy & Focus\n" \
-                       "   • Peak alertness during the day.\n" \
-                       "   • Reduced brain fog and midday slumps.\n" \
-                       "3. Balanced Hormones\n" \
-                       "   • Optimized cortisol, melatonin, and testosterone cycles.\n" \
-                       "   • Supports muscle growth, libido, and mental stability.\n" \
-                       "4. Enhanced Metabolism & Weight Loss\n" \
-                       "   • Better insulin sensitivity and digestion.\n" \
-                       "   • Aligns eating with natural digestive efficiency.\n" \
-                       "5. Better Mental Health\n" \
-                       "   • Reduced risk of depression and anxiety.\n" \
-                       "   • Stable mood regulation.\n" \
-                       "6. Stronger Immune Function\n" \
-                       "   • Reduced inflammation.\n" \
-                       "   • Optimized cellular repair during sleep.\n\n"
-
-        techniques_text = "🧠 Techniques to Align with Circadian Rhythm\n" \
-                         "🌞 Morning (6 AM – 10 AM)\n" \
-                         "   • Wake up at the same time daily, preferably at sunrise.\n" \
-                         "   • Get sunlight exposure within 30 minutes of waking (20+ minutes outdoors).\n" \
-                         "   • Avoid screens for the first 30 minutes.\n" \
-                         "   • Hydrate and eat a high-protein breakfast to jumpstart metabolism.\n" \
-                         "🕑 Daytime (10 AM – 6 PM)\n" \
-                         "   • Do focused mental tasks and workouts in the first half of the day (peak alertness).\n" \
-                         "   • Eat largest meal around midday, aligning with peak digestion.\n" \
-                         "   • Avoid caffeine after 2 PM.\n" \
-                         "🌇 Evening (6 PM – 10 PM)\n" \
-                         "   • Dim lights after sunset (use warm or red lights).\n" \
-                         "   • Limit screen use or use blue light blockers.\n" \
-                         "   • Eat a light dinner, ideally 2-3 hours before bedtime.\n" \
-                         "   • Start winding down rituals (reading, journaling, stretching).\n" \
-                         "🌙 Night (10 PM – 6 AM)\n" \
-                         "   • Sleep between 10 PM – 6 AM for best recovery.\n" \
-                         "   • Maintain a cool, dark, quiet bedroom.\n" \
-                         "   • Avoid eating, exercising, or stressing late at night.\n" \
-                         "   • Consistent sleep and wake time is key—even on weekends.\n" \
-                         "🔁 Optional Add-ons\n" \
-                         "   • Circadian Fasting (Time-Restricted Eating): Eat only between 8 AM and 6 PM.\n" \
-                         "   • Sun-mimicking lamps if living in low-sunlight areas.\n"
-
-        full_text = report_text + suggestions_text + benefits_text + techniques_text
-        report_display = tk.Text(left_column, height=30, width=50, font=("Arial", 10), wrap="word")
-        report_display.pack(expand=True, fill="both", padx=10, pady=10)
-        report_display.insert(tk.END, full_text)
-        report_display.config(state="disabled")
-
-        # Right column: Circadian rhythm graph
-        fig, ax = plt.subplots(figsize=(4, 4))  # Reduced size for symmetry
-        ax.plot(rhythm["energy"], rhythm["hours"], color="#007BFF", linewidth=2)
-        for time, label, color in [
-            (rhythm["wake_time"], "Wake", "green"), (rhythm["morning_peak"], "Peak", "red"),
-            (rhythm["dip_time"], "Dip", "orange"), (rhythm["evening_peak"], "Evening", "purple"),
-            (rhythm["bedtime"], "Bed", "blue")
-        ]:
-            h, m = map(int, time.split(":"))
-            y = h + m / 60
-            ax.axhline(y, color=color, linestyle="--", alpha=0.5, linewidth=1)
-            ax.text(0.5, y, f"{label}: {time}", color=color, fontsize=8, va="center")
-        ax.set_xlabel("Energy (0-10)", fontsize=10)
-        ax.set_ylabel("Time (Hours)", fontsize=10)
-        ax.set_ylim(0, 24)
-        ax.set_yticks(range(0, 25, 2))
-        ax.grid(True, alpha=0.3)
-        ax.set_title(f"{self.user_name}'s Circadian Rhythm", fontsize=12, pad=10)
-        canvas = FigureCanvasTkAgg(fig, master=right_column)
-        canvas.draw()
-        canvas.get_tk_widget().pack(expand=True, fill="both", padx=10, pady=10)
-
-        # Buttons centered at the bottom
+        # Right column: Circadian rhythm graph, created by ensure_rhythm_plot on the first report
+        self.rhythm_canvas = None
+
+        # Buttons centered at the bottom; Save uses the report currently on screen
         button_frame = ttk.Frame(self.result_frame)
         button_frame.grid(row=2, column=0, columnspan=2, pady=10)
         ttk.Button(button_frame, text="Log Another", command=self.show_log_frame).grid(row=0, column=0, padx=5)
-        ttk.Button(button_frame, text="Save Report", command=lambda: self.save_report(report_text, suggestions_text + benefits_text + techniques_text, rhythm)).grid(row=0, column=1, padx=5)
+        self.save_btn = ttk.Button(button_frame, text="Save Report", command=lambda: self.save_report(*self.report_args))
+        self.save_btn.grid(row=0, column=1, padx=5)
+
+    def show_result_frame(self, sleep_debt, rhythm, sleep_quality, tips, avg_debt, avg_chronotype, avg_energy, logs, log_count):
+        """Display sleep report with symmetrical layout and enhanced insights."""
+        self.clear_frames()
+        self.center_frame(self.result_frame)
+        self.result_title.config(text=f"{self.user_name}'s Sleeping Report")
+
+        # Left column: Report text
+        # Collect the lines once and join them in a single pass
+        parts = [
+            "Latest Sleep Log:",
+            f"Sleep Debt: {sleep_debt} hours",
+            f"Midpoint: {rhythm['midpoint']}",
+            f"Chronotype: {rhythm['chronotype']}",
+            f"Sleep Quality: {sleep_quality}/10",
+            "",
+            f"Average Over {log_count} Logs:",
+            f"Avg Sleep Debt: {avg_debt} hours",
+            f"Avg Chronotype: {avg_chronotype}",
+            f"Avg Energy: {avg_energy}/10",
+            "",
+            "Past Logs:",
+            *map(_LOG_LINE, range(1, len(logs) + 1), *zip(*logs)),
+            "", "",
+        ]
+        report_text = "\n".join(parts)
+        suggestions_text = "Suggestions:\n" + "\n".join(tips[:5]) + "\n\n"
+
+        set_readonly_text(self.report_display, report_text + suggestions_text, end="report_end")  # Static sections stay put
+        self.report_args = (report_text, suggestions_text + BENEFITS_TEXT + TECHNIQUES_TEXT, rhythm)
+
+        # Right column: Circadian rhythm graph (persistent canvas, redrawn in place)
+        self.ensure_rhythm_plot()
+        self.update_rhythm_plot(rhythm)
 
     def login(self):
         """Authenticate user and switch to log frame."""
@@ -324,21 +513,15 @@ class NeuroNapApp:
         result = database.login_user(email, password)
         if result:
             self.user_id, self.user_name = result
+            self._user_slug = safe_slug(self.user_name)
             # Load last log for Quick Fill
-            logs = database.get_user_sleep_logs(self.user_id)
+            logs = database.get_recent_sleep_logs(self.user_id, limit=1)
             if logs:
-                last_log = logs[-1]
-                self.last_inputs = {
-                    "sleep_time": last_log[0],
-                    "wake_time": last_log[1],
-                    "energy": last_log[2],
-                    "stress": last_log[3],
-                    "activity": last_log[4]
-                }
-            messagebox.showinfo("Success", f"Welcome back, {self.user_name}!")
+                self.last_inputs = LastInputs(*logs[0])  # Row columns match the field order
+            self._flash(f"Welcome back, {self.user_name}!")
             self.show_log_frame()
         else:
-            messagebox.showerror("Error", "Invalid email or password.")
+            self._flash("Invalid email or password.", "red")
 
     def register(self):
         """Register a new user and switch to log frame."""
@@ -351,126 +534,273 @@ class NeuroNapApp:
             if user_id:
                 self.user_id = user_id
                 self.user_name = name
-                messagebox.showinfo("Success", f"Registered as {self.user_name}!")
+                self._user_slug = safe_slug(name)
+                self._flash(f"Registered as {self.user_name}!")
                 self.show_log_frame()
             else:
                 messagebox.showerror("Error", "Email already taken.")
         except ValueError:
-            messagebox.showerror("Error", "Age must be a number.")
+            self._flash("Age must be a number.", "red")
 
     def log_sleep(self):
-        """Log sleep data and display results."""
+        """Validate the sleep log, then store and analyse it on a worker thread."""
+        if not self.ml_ready.is_set() or self.submit_btn.instate(["disabled"]):
+            return  # Model still loading, or a submit is already being handled
+        self.submit_btn.state(["disabled"])  # Ignore double-clicks/Enter repeats until this one finishes
         try:
             sleep_time = self.sleep_combo.get()
             wake_time = self.wake_combo.get()
             if not sleep_time or not wake_time:
                 raise ValueError("Please select sleep and wake times.")
-            energy = self.energy_var.get()
-            stress = self.stress_var.get()
-            activity = self.activity_entry.get()
-            activity = int(activity) if activity else 0
-            if not (0 <= energy <= 10 and 0 <= stress <= 10 and activity >= 0):
-                raise ValueError("Energy and Stress must be 1-10, Activity must be non-negative.")
-            datetime.strptime(sleep_time, "%H:%M")
-            datetime.strptime(wake_time, "%H:%M")
-
-            # Update last inputs for Quick Fill
-            self.last_inputs = {
-                "sleep_time": sleep_time,
-                "wake_time": wake_time,
-                "energy": energy,
-                "stress": stress,
-                "activity": activity
-            }
-            database.log_sleep(self.user_id, sleep_time, wake_time, energy, stress, activity)
-            logs = database.get_user_sleep_logs(self.user_id)
-
-            # Calculate sleep metrics
-            sleep_debt = backend.calculate_sleep_debt(sleep_time, wake_time)
-            duration = 8 - sleep_debt if sleep_debt <= 8 else 0
-            rhythm = backend.calculate_circadian_rhythm(sleep_time, wake_time, energy)
-            sleep_quality = ml.predict_sleep_quality(self.ml_model, self.ml_scaler, duration, activity, stress)
-            tips = backend.generate_recommendations(sleep_debt, rhythm["chronotype"], sleep_quality, rhythm)
-            avg_debt, avg_chronotype, avg_energy = backend.analyze_sleep_logs(logs)
-
-            self.show_result_frame(sleep_debt, rhythm, sleep_quality, tips, avg_debt, avg_chronotype, avg_energy, logs)
+            if not _HHMM.match(sleep_time) or not _HHMM.match(wake_time):
+                raise ValueError("Invalid time format (use HH:MM).")
         except ValueError as e:
-            messagebox.showerror("Error", str(e) or "Invalid time format (use HH:MM).")
+            self._flash(str(e) or "Invalid time format (use HH:MM).", "red")
+            self.root.after(250, lambda: self.submit_btn.state(["!disabled"]))
+            return
+        # Sliders are bounded to 1-10 and the activity entry only accepts digits
+        energy = int(self.energy_slider.get() + 0.5)  # Rounded here too in case the value changed without a release
+        stress = int(self.stress_slider.get() + 0.5)
+        activity = int(self.activity_entry.get() or 0)
+
+        # Update last inputs for Quick Fill
+        self.last_inputs = LastInputs(sleep_time, wake_time, energy, stress, activity)
+        self.loop.create_task(self._run_job(self.submit_btn, lambda result: self.show_result_frame(*result),
+                                            self._compute, self.user_id, sleep_time, wake_time, energy, stress, activity))
+
+    def _compute(self, user_id, sleep_time, wake_time, energy, stress, activity):
+        """Store a sleep log and compute its report (runs on a worker thread).
+
+        Returns:
+            tuple: Arguments for show_result_frame.
+        """
+        # One transaction for the insert and the report's reads: a single commit, and a consistent view
+        with database.transaction():
+            database.log_sleep(user_id, sleep_time, wake_time, energy, stress, activity)
+            logs = database.get_recent_log_entries(user_id)  # Only the rows and fields the report lists; averages come from SQL
+            summary = database.get_user_summary(user_id)
+
+        # Calculate sleep metrics
+        sleep_debt = backend.calculate_sleep_debt(sleep_time, wake_time)
+        duration = 8 - sleep_debt if sleep_debt <= 8 else 0
+        rhythm = backend.calculate_circadian_rhythm(sleep_time, wake_time, energy)
+        sleep_quality = ml.predict_sleep_quality(self.ml_model, self.ml_scaler, duration, activity, stress)
+        tips = backend.generate_recommendations(sleep_debt, rhythm["chronotype"], sleep_quality, rhythm)
+        avg_debt, avg_chronotype, avg_energy = backend.analyze_sleep_summary(summary)
+        return sleep_debt, rhythm, sleep_quality, tips, avg_debt, avg_chronotype, avg_energy, logs, summary[0]
+
+    async def _run_job(self, button, on_done, func, *args):
+        """Run func on the worker pool and hand its result to on_done on the Tk thread.
+
+        Args:
+            button (ttk.Button): Button disabled while the work runs; re-enabled afterwards.
+            on_done (callable): Called with func's result once it finishes.
+            func (callable): Blocking work to run off the Tk thread.
+            *args: Arguments for func.
+        """
+        try:
+            on_done(await self.loop.run_in_executor(self._pool, func, *args))
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+        finally:
+            self.root.after(250, lambda: button.state(["!disabled"]))
 
     def save_report(self, report_text, suggestions_text, rhythm):
         """Save sleep report as PDF with graph and FAQs."""
-        pdf_path = f"neuronap_report_{self.user_name}.pdf"
-        c = pdfcanvas.Canvas(pdf_path, pagesize=letter)
-        c.setFont("Helvetica", 10)
-
-        # Write report text
-        y = 750
-        c.drawString(50, y, f"{self.user_name}'s Sleeping Report")
-        y -= 20
-        for line in report_text.split("\n"):
-            c.drawString(50, y, line)
-            y -= 12
-            if y < 50:
-                c.showPage()
-                c.setFont("Helvetica", 10)
-                y = 750
-
-        # Write suggestions, benefits, and techniques
-        y -= 20
-        c.drawString(50, y, "Suggestions, Benefits, and Techniques")
-        y -= 12
-        for line in suggestions_text.split("\n"):
-            c.drawString(50, y, line)
-            y -= 12
-            if y < 50:
-                c.showPage()
-                c.setFont("Helvetica", 10)
-                y = 750
-
-        # Add circadian rhythm graph
-        c.showPage()
-        fig, ax = plt.subplots(figsize=(4, 4))
-        ax.plot(rhythm["energy"], rhythm["hours"], color="#007BFF", linewidth=2)
-        for time, label, color in [
-            (rhythm["wake_time"], "Wake", "green"), (rhythm["morning_peak"], "Peak", "red"),
-            (rhythm["dip_time"], "Dip", "orange"), (rhythm["evening_peak"], "Evening", "purple"),
-            (rhythm["bedtime"], "Bed", "blue")
-        ]:
-            h, m = map(int, time.split(":"))
-            y_val = h + m / 60
-            ax.axhline(y_val, color=color, linestyle="--", alpha=0.5, linewidth=1)
-            ax.text(0.5, y_val, f"{label}: {time}", color=color, fontsize=8, va="center")
-        ax.set_xlabel("Energy (0-10)", fontsize=10)
-        ax.set_ylabel("Time (Hours)", fontsize=10)
-        ax.set_ylim(0, 24)
-        ax.set_yticks(range(0, 25, 2))
-        ax.grid(True, alpha=0.3)
-        ax.set_title(f"{self.user_name}'s Circadian Rhythm", fontsize=12, pad=10)
-        fig.savefig("temp_graph.png", bbox_inches="tight")
-        plt.close(fig)
-        c.drawImage("temp_graph.png", 100, 400, width=350, height=300)
-        os.remove("temp_graph.png")
-
-        # Add FAQs
+        if self.save_btn.instate(["disabled"]):
+            return  # A save is already in progress
+        self.save_btn.state(["disabled"])
+        self.loop.create_task(self._run_job(self.save_btn, lambda pdf_path: self._flash(f"Report saved as {pdf_path}"),
+                                            write_report_pdf, self.user_name, report_text, suggestions_text, rhythm,
+                                            self._user_slug))
+
+def _setup_rhythm_axes(ax):
+    """Draw the static parts of a circadian rhythm graph: labels, limits, ticks, and grid."""
+    ax.set_xlabel("Energy (0-10)", fontsize=10)
+    ax.set_ylabel("Time (Hours)", fontsize=10)
+    ax.set_xlim(0, 10)
+    ax.set_ylim(0, 24)
+    ax.set_yticks(range(0, 25, 2))
+    ax.grid(True, alpha=0.3)
+
+def _add_rhythm_artists(ax, animated):
+    """Create the energy curve, marker lines, and marker labels of a rhythm graph.
+
+    Args:
+        ax (Axes): Axes prepared by _setup_rhythm_axes.
+        animated (bool): True for blitted on-screen artists, False for one-off renders.
+
+    Returns:
+        tuple: (curve Line2D, marker LineCollection, list of five marker Text artists).
+    """
+    from matplotlib.collections import LineCollection
+    line, = ax.plot([], [], color="#007BFF", linewidth=2, animated=animated)
+    # One dashed segment and label per rhythm["marker_table"] entry (wake, peak, dip, evening, bed),
+    # with all five segments in a single LineCollection
+    marker_lines = ax.add_collection(LineCollection([], linestyles="--", alpha=0.5, linewidths=1, animated=animated))
+    marker_texts = [ax.text(0.5, 0, "", fontsize=8, va="center", animated=animated) for _ in range(5)]
+    return line, marker_lines, marker_texts
+
+def _set_rhythm_data(line, marker_lines, marker_texts, rhythm):
+    """Point the rhythm graph artists at a rhythm from backend.calculate_circadian_rhythm."""
+    line.set_data(rhythm["energy"], rhythm["hours"])
+    markers = rhythm["marker_table"]
+    marker_lines.set_segments([((0, y), (10, y)) for y, _, _, _ in markers])  # Full x range (xlim 0-10)
+    marker_lines.set_color([color for _, _, color, _ in markers])
+    for (y, label, color, time), text in zip(markers, marker_texts):
+        text.set_position((0.5, y))
+        text.set_color(color)
+        text.set_text(f"{label}: {time}")
+
+def rhythm_key(rhythm):
+    """Return a hashable key that is equal for rhythms that draw the same graph.
+
+    Args:
+        rhythm (dict): Result of backend.calculate_circadian_rhythm.
+
+    Returns:
+        tuple: Marker table and the raw bytes of the energy curve.
+    """
+    return rhythm["marker_table"], rhythm["energy"].tobytes()
+
+def _pdf_rhythm_figure():
+    """Return the off-screen (figure, axes, artists) used for PDF graphs, creating it on first use."""
+    global _PDF_FIGURE
+    if _PDF_FIGURE is None:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure(figsize=(4, 4))
+        FigureCanvasAgg(fig)  # Plain Agg: rendering never goes through Tk
+        ax = fig.add_subplot(111)
+        _setup_rhythm_axes(ax)
+        _PDF_FIGURE = fig, ax, _add_rhythm_artists(ax, animated=False)
+    return _PDF_FIGURE
+
+def render_rhythm_png(user_name, rhythm):
+    """Render a rhythm graph to PNG on an off-screen Agg canvas (safe to run off the Tk thread).
+
+    The figure and its artists are built once and reused for every report, and
+    saving the same graph again reuses the last PNG instead of rendering it.
+
+    Args:
+        user_name (str): Name shown in the graph title.
+        rhythm (dict): Result of backend.calculate_circadian_rhythm.
+
+    Returns:
+        BytesIO: PNG data, rewound to the start.
+    """
+    global _PDF_LAST_PNG
+    title = f"{user_name}'s Circadian Rhythm"
+    key = rhythm_key(rhythm)
+    with _PDF_FIGURE_LOCK:  # One worker at a time may restyle and render the shared figure
+        if _PDF_LAST_PNG is None or _PDF_LAST_PNG[:2] != (title, key):
+            fig, ax, artists = _pdf_rhythm_figure()
+            ax.set_title(title, fontsize=12, pad=10)
+            _set_rhythm_data(*artists, rhythm)
+            graph_png = io.BytesIO()  # Encode in memory instead of a temp file
+            fig.savefig(graph_png, format="png", bbox_inches="tight")
+            _PDF_LAST_PNG = title, key, graph_png.getvalue()
+        return io.BytesIO(_PDF_LAST_PNG[2])
+
+def write_report_pdf(user_name, report_text, suggestions_text, rhythm, slug):
+    """Write the sleep report PDF (safe to run off the Tk thread).
+
+    Args:
+        user_name (str): Name shown in the report and graph titles.
+        report_text (str): Latest log, averages, and past logs.
+        suggestions_text (str): Suggestions, benefits, and techniques.
+        rhythm (dict): Circadian rhythm to graph, from backend.calculate_circadian_rhythm.
+        slug (str): File-name-safe user name, from safe_slug.
+
+    Returns:
+        str: Path of the saved PDF.
+    """
+    # ReportLab is only needed once the user saves a report
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas as pdfcanvas
+    from reportlab.lib.utils import ImageReader
+
+    pdf_path = f"neuronap_report_{slug}.pdf"
+    c = pdfcanvas.Canvas(pdf_path, pagesize=letter)
+    c.setFont("Helvetica", 10)
+
+    # Write report text
+    c.drawString(50, 750, f"{user_name}'s Sleeping Report")
+    y = write_pdf_lines(c, report_text.split("\n"), 730)
+
+    # Write suggestions, benefits, and techniques
+    write_pdf_lines(c, ["Suggestions, Benefits, and Techniques"] + suggestions_text.split("\n"), y - 20)
+
+    # Add circadian rhythm graph
+    c.showPage()
+    c.drawImage(ImageReader(render_rhythm_png(user_name, rhythm)), 100, 400, width=350, height=300)
+
+    # Add FAQs
+    c.showPage()
+    write_pdf_lines(c, ("Frequently Asked Questions",) + _FAQ_LINES, 750)
+    c.save()
+    return pdf_path
+
+def safe_slug(name):
+    """Reduce a user name to letters, digits, '_' and '-' for use in a file name.
+
+    Args:
+        name (str): User name as registered.
+
+    Returns:
+        str: At most 40 characters, with each run of other characters replaced by '_'.
+    """
+    return _UNSAFE_FILENAME.sub("_", name)[:40] or "user"
+
+def snap_slider(event):
+    """Round a 1-10 slider to the nearest whole step when the user lets go of it."""
+    event.widget.set(int(float(event.widget.get()) + 0.5))
+
+def set_readonly_text(widget, text, end=tk.END):
+    """Replace the contents of a disabled Text widget in one unlock/replace/lock sequence.
+
+    Tk redraws the widget once at idle time, after the whole sequence has run.
+
+    Args:
+        widget (tk.Text): Text widget kept in the "disabled" state.
+        text (str): New contents, already joined into a single string.
+        end (str): Index where the replaced region stops; text after it is kept.
+    """
+    widget.configure(state="normal")
+    widget.replace("1.0", end, text)  # One Tcl call instead of delete + insert
+    widget.configure(state="disabled")
+    widget.yview_moveto(0)  # Show each new report from the top
+
+def write_pdf_lines(c, lines, y=750):
+    """Write lines to a PDF canvas using one text object per page.
+
+    Args:
+        c (Canvas): ReportLab canvas to draw on.
+        lines (iterable): Lines of text, top to bottom.
+        y (float): Starting baseline on the current page.
+
+    Returns:
+        float: Baseline just below the last line written.
+    """
+    if y < 50:
         c.showPage()
         y = 750
-        c.drawString(50, y, "Frequently Asked Questions")
+    text = c.beginText(50, y)
+    text.setFont("Helvetica", 10)
+    text.setLeading(12)
+    for line in lines:
+        text.textLine(line)
         y -= 12
-        faq_text = """Sleep and Immune Function: Sleep boosts immunity. Missing 7 hours weekly ups cold risk!
-Sleep Need & Debt: Most need 7-9 hours. Debt accumulates over 2 weeks—keep under 5 hours.
-Circadian Rhythm: Energy peaks morning/evening, dips midday, tied to sleep habits.
-Alcohol and Sleep: May aid sleep onset but disrupts deep sleep. Avoid 3-4 hours pre-bed.
-Naps: 15-25 min naps during dips recharge without affecting night sleep.
-Sleep Schedule Tips: Morning light, no caffeine 10 hours before bed, cozy sleep space."""
-        for line in faq_text.split("\n"):
-            c.drawString(50, y, line)
-            y -= 12
-            if y < 50:
-                c.showPage()
-                c.setFont("Helvetica", 10)
-                y = 750
-        c.save()
-        messagebox.showinfo("Success", f"Report saved as {pdf_path}")
+        if y < 50:
+            # Flush this page's text object and continue at the top of a new page
+            c.drawText(text)
+            c.showPage()
+            y = 750
+            text = c.beginText(50, y)
+            text.setFont("Helvetica", 10)
+            text.setLeading(12)
+    c.drawText(text)
+    return y
 
 def run_app():
     """Launch the NeuroNap application."""
@@ -3,32 +3,95 @@
 # Date: April 11, 2025
 # Description: Contains pytest tests for key functions to ensure reliability
 
+import os
 import pytest
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 import backend
 import database
 import ml
-import os
+import gui
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point the database module at a fresh, initialized file for one test."""
+    database.close_db()  # Drop any connection still open on another file
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "neuronap.db"))
+    database.init_db()
+    yield
+    database.close_db()
 
 def test_calculate_sleep_debt():
     """Test sleep debt calculation for various sleep durations."""
     assert backend.calculate_sleep_debt("23:00", "07:00") == 0  # 8 hours, no debt
     assert backend.calculate_sleep_debt("01:00", "05:00") == 4  # 4 hours, 4-hour debt
 
+def test_sleep_data_derived_fields():
+    """Test derived hour fields on a SleepData entry."""
+    entry = backend.SleepData("23:30", "06:30", 7, 4, 30)
+    assert (entry.duration, entry.midpoint_h, entry.debt) == (7.0, 3.0, 1.0)
+    assert entry.debt == backend.calculate_sleep_debt("23:30", "06:30")  # Same as the string API
+
 def test_circadian_rhythm_chronotype():
     """Test chronotype assignment in circadian rhythm calculation."""
     rhythm = backend.calculate_circadian_rhythm("22:00", "06:00", 8)
     assert rhythm["chronotype"] == "Early Bird"  # Early sleep midpoint
+    assert rhythm["midpoint"] == "02:00" and rhythm["midpoint_hour"] == 2.0  # String and float forms
     rhythm = backend.calculate_circadian_rhythm("02:00", "10:00", 6)
     assert rhythm["chronotype"] == "Night Owl"  # Late sleep midpoint
 
-def test_database_user_registration():
+def test_database_user_registration(temp_db):
     """Test user registration and login functionality."""
-    database.init_db()
     user_id = database.register_user("TestUser", "test@example.com", "pass123", 25)
     assert user_id is not None  # Successful registration
     result = database.login_user("test@example.com", "pass123")
     assert result == (user_id, "TestUser")  # Successful login
-    os.remove("neuronap.db")  # Clean up test database
+    assert database.login_user("test@example.com", "wrong") is None  # Wrong password rejected
+
+def test_database_password_hashing(temp_db):
+    """Test passwords are stored as salted hashes, never plaintext."""
+    database.register_user("UserA", "a@example.com", "same-pass", 25)
+    database.register_user("UserB", "b@example.com", "same-pass", 30)
+    rows = database.get_connection().execute("SELECT password, salt FROM users ORDER BY user_id").fetchall()
+    assert all(bytes(pw) != b"same-pass" and len(salt) == 16 for pw, salt in rows)  # Digest plus 16-byte salt
+    assert rows[0][0] != rows[1][0]  # Per-user salt gives different digests for the same password
+
+def test_database_bulk_sleep_logs(temp_db):
+    """Test batch insertion and retrieval of sleep logs."""
+    user_id = database.register_user("BulkUser", "bulk@example.com", "pass123", 30)
+    rows = [(user_id, "23:00", "07:00", 7, 4, 30), (user_id, "00:30", "06:30", 5, 6, 0)]
+    database.log_sleep_bulk(rows)
+    assert database.get_user_sleep_logs(user_id) == [r[1:] for r in rows]  # Stored in order
+    soa = database.get_user_sleep_logs_soa(user_id)
+    assert list(soa["energy"]) == [7, 5]  # One array per column
+    assert backend.analyze_sleep_arrays(soa) == backend.analyze_sleep_logs([r[1:] for r in rows])
+    count, avg_debt, avg_midpoint, avg_energy = database.get_user_summary(user_id)
+    assert (count, round(avg_debt, 2), avg_midpoint, avg_energy) == (2, 1.0, 3.25, 6.0)  # Aggregated in SQL
+    assert backend.analyze_sleep_summary(database.get_user_summary(user_id)) == backend.analyze_sleep_logs([r[1:] for r in rows])
+    assert database.get_recent_sleep_logs(user_id, limit=1) == [rows[-1][1:]]  # Newest first
+    assert database.get_recent_log_entries(user_id) == [r[1:4] for r in reversed(rows)]  # Listed fields only
+
+def test_database_transaction_rollback(temp_db):
+    """Test a failed transaction leaves no partial writes behind."""
+    user_id = database.register_user("TxUser", "tx@example.com", "pass123", 30)
+    with pytest.raises(RuntimeError):
+        with database.transaction():
+            database.log_sleep(user_id, "23:00", "07:00", 7, 4, 30)
+            raise RuntimeError("abort")
+    assert database.get_user_sleep_logs(user_id) == []  # Insert rolled back
+    with database.transaction():
+        database.log_sleep(user_id, "23:00", "07:00", 7, 4, 30)
+        assert database.get_user_summary(user_id)[0] == 1  # Reads see the pending insert
+    assert len(database.get_user_sleep_logs(user_id)) == 1
+    conn = database.get_connection()
+    conn.execute("PRAGMA foreign_keys=ON")
+    with pytest.raises(sqlite3.IntegrityError):  # Deferred foreign key check fails at COMMIT
+        with database.transaction():
+            conn.execute("PRAGMA defer_foreign_keys=ON")
+            database.log_sleep(user_id + 1, "23:00", "07:00", 7, 4, 30)  # No such user
+    assert not conn.in_transaction  # Failed COMMIT rolled back, so the next transaction can start
+    database.log_sleep_bulk([(user_id, "00:30", "06:30", 5, 6, 0)])
+    assert len(database.get_user_sleep_logs(user_id)) == 2
 
 def test_ml_prediction():
     """Test sleep quality prediction with and without model."""
@@ -39,6 +102,70 @@ def test_ml_prediction():
         quality = ml.predict_sleep_quality(model, scaler, 7.5, 60, 4)
         assert quality in range(4, 10)  # Valid quality range
 
+def test_ml_batch_prediction():
+    """Test batch prediction matches single-row prediction."""
+    X = [[8, 60, 5], [6, 20, 8], [7.5, 45, 3]]
+    assert list(ml.predict_sleep_quality_batch(None, None, X)) == [6, 6, 6]  # Default without model
+    model, scaler = ml.train_model()
+    if model is not None:
+        batch = ml.predict_sleep_quality_batch(model, scaler, X)
+        assert list(batch) == [ml.predict_sleep_quality(model, scaler, *row) for row in X]
+        features = [row + [70, 8000] for row in X]  # Average heart rate and daily steps
+        assert list(batch) == list(model.predict(scaler.transform(features)))  # Same as sklearn's own predict
+        with ThreadPoolExecutor(max_workers=4) as pool:  # Same pool use as the GUI's submit path
+            parallel = list(pool.map(lambda row: ml.predict_sleep_quality(model, scaler, *row), X * 20))
+        assert parallel == list(batch) * 20  # Concurrent calls don't share input rows
+
+def test_model_cache_invalidation(tmp_path, monkeypatch):
+    """Test the model cache key follows both the training data and the forest settings."""
+    csv = tmp_path / "data.csv"
+    monkeypatch.setattr(ml, "DATA_PATH", str(csv))
+    monkeypatch.setattr(ml, "MODEL_CACHE_DIR", str(tmp_path / "cache"))
+    stamp = tmp_path / "cache" / "data.stamp"
+    csv.write_text("header\n1,2,3\n")
+    first = ml._data_fingerprint()
+    assert first and stamp.read_text().endswith(first)  # Digest remembered for the next launch
+    assert ml._data_fingerprint() == first  # Unchanged file reuses the stamp
+    csv.write_text("header\n1,2,3\n4,5,6\n")
+    second = ml._data_fingerprint()
+    assert second != first and stamp.read_text().endswith(second)  # Edited CSV re-hashed and stamp rewritten
+    path = ml._model_cache_path(second)
+    monkeypatch.setitem(ml.FOREST_PARAMS, "n_estimators", 50)
+    assert ml._model_cache_path(second) != path  # New forest settings never load the old model
+
+def test_model_cache_prunes_stale_files(tmp_path, monkeypatch):
+    """Test retraining leaves only the current model file in the cache directory."""
+    monkeypatch.setattr(ml, "MODEL_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(ml, "_MODEL", None)
+    monkeypatch.setattr(ml, "_SCALER", None)
+    for stale in ("model.joblib", "model_oldsha_100xNone.joblib"):  # Older layout and older settings
+        (tmp_path / stale).write_bytes(b"stale")
+    model, _ = ml.load_model()
+    if model is not None:
+        cached = sorted(p.name for p in tmp_path.glob("model*.joblib"))
+        assert cached == [os.path.basename(ml._model_cache_path(ml._data_fingerprint()))]
+
+def test_model_load_failure_releases_submit(monkeypatch):
+    """Test a failed background model load still marks the model as ready."""
+    def broken_load():
+        raise ImportError("no sklearn")
+    monkeypatch.setattr(ml, "load_model", broken_load)
+    app = gui.NeuroNapApp.__new__(gui.NeuroNapApp)  # Skip __init__; no display needed
+    app.ml_model = app.ml_scaler = None
+    app.ml_ready = gui.threading.Event()
+    app._model_error = None
+    app.load_model()
+    assert app.ml_ready.is_set()  # Submit gets re-enabled
+    assert "no sklearn" in app._model_error and app.ml_model is None  # Reported; default predictions used
+
+def test_safe_slug():
+    """Test report file names can't escape the directory or come out empty."""
+    assert gui.safe_slug("../../etc") == "_etc"  # No separators or dot segments survive
+    assert gui.safe_slug("日本") == "_"  # Non-ASCII collapses to one placeholder
+    assert gui.safe_slug("") == "user"  # Empty names still give a file name
+    assert gui.safe_slug("a" * 50) == "a" * 40  # Capped at 40 characters
+    assert gui.safe_slug("Ann-Marie_2") == "Ann-Marie_2"  # Safe names unchanged
+
 def test_recommendations():
     """Test generation of sleep recommendations."""
     rhythm = backend.calculate_circadian_rhythm("23:00", "07:00", 7)
@@ -51,4 +178,19 @@ def test_circadian_energy_scaling():
     """Test energy scaling in circadian rhythm calculation."""
     rhythm_high = backend.calculate_circadian_rhythm("23:00", "07:00", 10)
     rhythm_low = backend.calculate_circadian_rhythm("23:00", "07:00", 5)
-    assert max(rhythm_high["energy"]) > max(rhythm_low["energy"])  # Higher energy scales up
\ No newline at end of file
+    assert max(rhythm_high["energy"]) > max(rhythm_low["energy"])  # Higher energy scales up
+
+def test_parse_hm_array_rejects_bad_times():
+    """Test the vectorized time parser accepts only valid zero-padded HH:MM values."""
+    assert list(backend._parse_hm_array(["07:30", "23:59", "00:00"])) == [7.5, 23 + 59 / 60, 0.0]
+    for bad in ("7:30", "07:300", "07-30", "0a:30", "24:00", "25:99", "12:60", "０７:30"):
+        with pytest.raises(ValueError):  # Wrong length, missing colon, non-digit, or out of range
+            backend._parse_hm_array(["23:00", bad])
+    with pytest.raises(ValueError):  # Bad lengths that still total a multiple of 5
+        backend._parse_hm_array(["12:3", "412:34"])
+
+def test_analyze_sleep_logs():
+    """Test averaged debt, chronotype, and energy across several logs."""
+    logs = [("23:00", "07:00", 8, 5, 30), ("01:00", "05:00", 4, 7, 0), ("02:00", "10:00", 6, 3, 60)]
+    assert backend.analyze_sleep_logs(logs) == (1.33, "Intermediate", 6.0)  # Mixed schedules
+    assert backend.analyze_sleep_logs([]) == (0, "N/A", 0)  # No logs yet